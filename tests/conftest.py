@@ -13,8 +13,9 @@ Usage:
 
 import pytest
 from playwright.sync_api import Page, BrowserContext, expect
-from typing import Generator
+from typing import Generator, Optional
 import os
+import uuid
 
 # =============================================================================
 # CONFIGURATION
@@ -28,6 +29,20 @@ BASE_URL = "http://10.0.0.7:5001"  #os.environ.get("TEST_BASE_URL", "http://10.0
 TEST_USER_EMAIL = os.environ.get("TEST_USER_EMAIL", "admin")
 TEST_USER_PASSWORD = os.environ.get("TEST_USER_PASSWORD", "admin")
 
+# Opt-in request tracing: TEST_TRACE=1 sends a W3C trace context header with
+# every request to the app under test, so the services can join their spans
+# to the test that triggered them
+TRACE_ENABLED = os.environ.get("TEST_TRACE", "0") == "1"
+TRACEPARENT_HEADER = "traceparent"
+
+# Traced passing tests slower than this (setup + call, in seconds) are listed
+# with their trace IDs
+SLOW_TEST_THRESHOLD = float(os.environ.get("TEST_SLOW_THRESHOLD", "10"))
+
+# (nodeid, duration, trace_id) of slow passing tests, reported at session end.
+# Filled from pytest_runtest_logreport, so it also works under pytest-xdist.
+_slow_tests = []
+
 # Timeouts (in milliseconds)
 DEFAULT_TIMEOUT = 30000  # 30 seconds for page loads
 NAVIGATION_TIMEOUT = 15000  # 15 seconds for navigation
@@ -62,6 +77,44 @@ def browser_context_args(browser_context_args):
 # Configure it in pytest.ini or via command line: pytest --base-url http://localhost:5000
 
 
+# =============================================================================
+# TRACING FIXTURES
+# =============================================================================
+
+@pytest.fixture(autouse=True)
+def trace_id(base_url: str, request) -> Optional[str]:
+    """
+    Attach a fresh trace ID to every test when TEST_TRACE=1 is set.
+    
+    The ID is sent as a W3C ``traceparent`` header on requests to the app
+    under test only - third-party origins never see it, so it can't trigger
+    CORS preflights or leak test IDs. It is also recorded in the test's user
+    properties (and therefore in --junitxml output), printed in the report
+    of failed tests and listed at the end of the run for slow tests. Look it
+    up in the service span files to see where the test spent its time.
+    
+    The header is added through ``context.route()``, which turns off the
+    browser's HTTP cache and sends every app request through a Python
+    handler. Traced runs are therefore slower than normal ones, which is
+    why tracing is off by default and no route is registered then.
+    """
+    if not TRACE_ENABLED:
+        return None
+    
+    context: BrowserContext = request.getfixturevalue("context")
+    trace_id = uuid.uuid4().hex
+    span_id = uuid.uuid4().hex[:16]
+    traceparent = f"00-{trace_id}-{span_id}-01"
+    url = base_url if base_url else BASE_URL
+    
+    context.route(
+        f"{url}/**",
+        lambda route: route.continue_(headers={**route.request.headers, TRACEPARENT_HEADER: traceparent}),
+    )
+    request.node.user_properties.append(("trace_id", trace_id))
+    return trace_id
+
+
 # =============================================================================
 # AUTHENTICATION FIXTURES
 # =============================================================================
@@ -155,6 +208,39 @@ def pytest_runtest_makereport(item, call):
     outcome = yield
     rep = outcome.get_result()
     setattr(item, f"rep_{rep.when}", rep)
+    
+    # Surface the trace ID of failed and slow tests so it can be looked up directly
+    trace_ids = [value for name, value in item.user_properties if name == "trace_id"]
+    if not trace_ids:
+        return
+    if rep.failed:
+        rep.sections.append(("trace", f"trace_id={trace_ids[0]}"))
+    elif rep.when == "setup":
+        # Login happens in setup (logged_in_page), so count it towards slowness
+        item.trace_setup_duration = rep.duration
+    elif rep.when == "call":
+        duration = getattr(item, "trace_setup_duration", 0.0) + rep.duration
+        if duration > SLOW_TEST_THRESHOLD:
+            # Reports are sent back from xdist workers, module state is not
+            rep.user_properties.append(("slow_test_duration", duration))
+
+
+def pytest_runtest_logreport(report):
+    """Collect slow traced tests from their call reports."""
+    if report.when != "call":
+        return
+    properties = dict(report.user_properties)
+    if "slow_test_duration" in properties:
+        _slow_tests.append((report.nodeid, properties["slow_test_duration"], properties["trace_id"]))
+
+
+def pytest_terminal_summary(terminalreporter):
+    """List slow passing tests with their trace IDs."""
+    if not _slow_tests:
+        return
+    terminalreporter.section(f"slow tests (> {SLOW_TEST_THRESHOLD:g}s) and their traces")
+    for nodeid, duration, trace_id in sorted(_slow_tests, key=lambda t: t[1], reverse=True):
+        terminalreporter.write_line(f"{duration:7.2f}s  trace_id={trace_id}  {nodeid}")
 
 
 # =============================================================================